@@ -14,6 +14,7 @@ from chemfunc.molecular_fingerprints import (
     get_fingerprint_generator,
     get_available_fingerprint_generators,
     compute_morgan_fingerprint,
+    compute_morgan_fingerprint_bitvect,
     compute_rdkit_fingerprint,
     compute_fingerprint,
     compute_fingerprints,
@@ -34,6 +35,7 @@ from chemfunc.molecular_similarities import (
     get_similarity_function,
     get_available_similarity_functions,
     compute_pairwise_tanimoto_similarities,
+    compute_tanimoto_nearest_neighbors,
     compute_mcs_size,
     compute_pairwise_mcs_similarities,
     compute_pairwise_tversky_similarities,
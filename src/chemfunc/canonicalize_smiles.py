@@ -1,12 +1,154 @@
 """Canonicalizes SMILES using RDKit canonicalization and optionally strips salts."""
+import sqlite3
+from multiprocessing import Pool
 from pathlib import Path
 
-import pandas as pd
 from rdkit import Chem
 from rdkit.Chem.SaltRemover import SaltRemover
 from tqdm import tqdm
 
 from chemfunc.constants import SMILES_COLUMN
+from chemfunc.csv_io import read_csv, write_csv
+
+CHUNKSIZE = 1024
+
+# Maximum number of parameters per SQLite query
+SQLITE_BATCH_SIZE = 900
+
+
+def _mol_from_smiles(smiles: str) -> Chem.Mol | None:
+    """Converts a SMILES string to an RDKit molecule (module-level for multiprocessing).
+
+    :param smiles: A SMILES string.
+    :return: An RDKit molecule or None if the SMILES is invalid.
+    """
+    return Chem.MolFromSmiles(smiles)
+
+
+def _mol_to_smiles(mol: Chem.Mol) -> str:
+    """Converts an RDKit molecule to a (canonical) SMILES string (module-level for multiprocessing).
+
+    :param mol: An RDKit molecule.
+    :return: A canonical SMILES string.
+    """
+    return Chem.MolToSmiles(mol)
+
+
+_SALT_REMOVER = None
+
+
+def _strip_salts(mol: Chem.Mol) -> Chem.Mol:
+    """Strips salts from an RDKit molecule (module-level for multiprocessing).
+
+    :param mol: An RDKit molecule.
+    :return: The RDKit molecule with salts stripped.
+    """
+    global _SALT_REMOVER
+
+    # Create the salt remover once per process
+    if _SALT_REMOVER is None:
+        _SALT_REMOVER = SaltRemover()
+
+    return _SALT_REMOVER.StripMol(mol, dontRemoveEverything=True)
+
+
+def _canonicalize_smiles_list(smiles: list[str], remove_salts: bool) -> list[str | None]:
+    """Canonicalizes a list of SMILES using RDKit canonicalization (in parallel).
+
+    :param smiles: A list of SMILES strings.
+    :param remove_salts: Whether to remove salts from the SMILES.
+    :return: A list containing the canonical SMILES for each input SMILES, or None where the SMILES is invalid.
+    """
+    canonical_smiles: list[str | None] = [None] * len(smiles)
+
+    with Pool() as pool:
+        # Convert SMILES to mol
+        mols = list(tqdm(pool.imap(_mol_from_smiles, smiles, chunksize=CHUNKSIZE),
+                         total=len(smiles), desc='SMILES to mol'))
+
+        # Skip SMILES that RDKit cannot process
+        valid_indices = [index for index, mol in enumerate(mols) if mol is not None]
+        mols = [mols[index] for index in valid_indices]
+
+        # Optionally remove salts (StripMol is pure Python and holds the GIL, so worker processes
+        # are needed for real parallelism despite the Mol pickling cost)
+        if remove_salts:
+            mols = list(tqdm(pool.imap(_strip_salts, mols, chunksize=CHUNKSIZE),
+                             total=len(mols), desc='Stripping salts'))
+
+        # Convert mol to SMILES (implicitly canonicalizes SMILES)
+        for index, smile in zip(valid_indices, tqdm(pool.imap(_mol_to_smiles, mols, chunksize=CHUNKSIZE),
+                                                    total=len(mols), desc='Mol to SMILES')):
+            canonical_smiles[index] = smile
+
+    return canonical_smiles
+
+
+def _canonicalize_smiles_list_cached(
+        smiles: list[str],
+        remove_salts: bool,
+        cache_path: Path
+) -> list[str | None]:
+    """Canonicalizes a list of SMILES, using an on-disk cache to skip previously canonicalized SMILES.
+
+    The cache is an SQLite table keyed by the input SMILES string along with the remove_salts flag
+    (since it changes the result). Invalid SMILES are cached as NULL.
+
+    :param smiles: A list of SMILES strings.
+    :param remove_salts: Whether to remove salts from the SMILES.
+    :param cache_path: Path to an SQLite file holding the cache (created if it does not exist).
+    :return: A list containing the canonical SMILES for each input SMILES, or None where the SMILES is invalid.
+    """
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+    connection = sqlite3.connect(cache_path)
+
+    try:
+        # The with block commits on success (sqlite3 connections do not close on __exit__)
+        with connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS canonical_smiles ('
+                'smiles TEXT NOT NULL, '
+                'remove_salts INTEGER NOT NULL, '
+                'canonical TEXT, '
+                'PRIMARY KEY (smiles, remove_salts))'
+            )
+
+            # Look up cached canonicalizations
+            smiles_to_canonical = {}
+            unique_smiles = list(dict.fromkeys(smiles))
+
+            for start in range(0, len(unique_smiles), SQLITE_BATCH_SIZE):
+                batch = unique_smiles[start:start + SQLITE_BATCH_SIZE]
+                rows = connection.execute(
+                    f'SELECT smiles, canonical FROM canonical_smiles '
+                    f'WHERE remove_salts = ? AND smiles IN ({",".join("?" * len(batch))})',
+                    [int(remove_salts), *batch]
+                ).fetchall()
+                smiles_to_canonical.update(rows)
+
+            print(f'Found {len(smiles_to_canonical):,} of {len(unique_smiles):,} unique SMILES in cache')
+
+            # Canonicalize the SMILES that are not in the cache
+            miss_smiles = [smile for smile in unique_smiles if smile not in smiles_to_canonical]
+
+            if miss_smiles:
+                missed_canonical_smiles = _canonicalize_smiles_list(
+                    smiles=miss_smiles,
+                    remove_salts=remove_salts
+                )
+
+                # Add the new canonicalizations to the cache
+                new_entries = dict(zip(miss_smiles, missed_canonical_smiles))
+                connection.executemany(
+                    'INSERT OR REPLACE INTO canonical_smiles (smiles, remove_salts, canonical) VALUES (?, ?, ?)',
+                    [(smile, int(remove_salts), canonical) for smile, canonical in new_entries.items()]
+                )
+                smiles_to_canonical.update(new_entries)
+    finally:
+        connection.close()
+
+    return [smiles_to_canonical[smile] for smile in smiles]
 
 
 def canonicalize_smiles(
@@ -15,7 +157,9 @@ def canonicalize_smiles(
         smiles_column: str = SMILES_COLUMN,
         canonical_smiles_column: str = SMILES_COLUMN,
         remove_salts: bool = False,
-        delete_disconnected_mols: bool = False
+        delete_disconnected_mols: bool = False,
+        fast_io: bool = False,
+        cache_path: Path | None = None
 ) -> None:
     """Canonicalizes SMILES using RDKit canonicalization and optionally strips salts.
 
@@ -27,29 +171,46 @@ def canonicalize_smiles(
     :param delete_disconnected_mols: Whether to delete disconnected molecules, i.e., any molecule whose
                                      SMILES has a '.' in it. This is performed after (optionally) removing salts.
                                      This deletes the entire row from the Pandas DataFrame.
+    :param fast_io: Whether to read and write CSV files with PyArrow, which parses multithreaded
+                    and skips Pandas dtype inference (requires the pyarrow package).
+    :param cache_path: Path to an SQLite file caching canonicalized SMILES by content hash
+                       (created if it does not exist). If None, no cache is used. The cache makes
+                       re-runs over overlapping datasets skip the RDKit roundtrip for known SMILES.
     """
     # Load data
-    data = pd.read_csv(data_path)
+    data = read_csv(data_path, fast_io=fast_io)
     print(f'Data size = {len(data):,}')
 
-    # Convert SMILES to mol
-    mols = [Chem.MolFromSmiles(smiles) for smiles in tqdm(data[smiles_column], desc='SMILES to mol')]
+    # Deduplicate SMILES so each unique SMILES is only canonicalized once
+    smiles = list(data[smiles_column])
+    unique_smiles = list(dict.fromkeys(smiles))
+
+    if len(unique_smiles) < len(smiles):
+        print(f'Canonicalizing {len(unique_smiles):,} unique SMILES out of {len(smiles):,}')
+
+    # Canonicalize SMILES, optionally using the on-disk cache
+    if cache_path is not None:
+        unique_canonical_smiles = _canonicalize_smiles_list_cached(
+            smiles=unique_smiles,
+            remove_salts=remove_salts,
+            cache_path=cache_path
+        )
+    else:
+        unique_canonical_smiles = _canonicalize_smiles_list(smiles=unique_smiles, remove_salts=remove_salts)
+
+    # Map the canonical SMILES back onto the full (duplicated) SMILES list
+    smiles_to_canonical = dict(zip(unique_smiles, unique_canonical_smiles))
+    canonical_smiles = [smiles_to_canonical[smile] for smile in smiles]
 
     # Handle SMILES that RDKit cannot process
-    valid_mols = [mol is not None for mol in mols]
+    valid_mols = [canonical is not None for canonical in canonical_smiles]
 
     if not all(valid_mols):
         print(f'Found {len(valid_mols) - sum(valid_mols)} invalid molecules. Deleting.')
         data = data[valid_mols]
-        mols = [mol for mol, valid_mol in zip(mols, valid_mols) if valid_mol]
-
-    # Optionally remove salts
-    if remove_salts:
-        remover = SaltRemover()
-        mols = [remover.StripMol(mol, dontRemoveEverything=True) for mol in tqdm(mols, desc='Stripping salts')]
+        canonical_smiles = [canonical for canonical in canonical_smiles if canonical is not None]
 
-    # Convert mol to SMILES (implicitly canonicalizes SMILES)
-    data[canonical_smiles_column] = [Chem.MolToSmiles(mol) for mol in tqdm(mols, desc='Mol to SMILES')]
+    data[canonical_smiles_column] = canonical_smiles
 
     # Optionally delete disconnected molecules
     if delete_disconnected_mols:
@@ -65,4 +226,4 @@ def canonicalize_smiles(
         save_path = data_path
 
     save_path.parent.mkdir(parents=True, exist_ok=True)
-    data.to_csv(save_path, index=False)
+    write_csv(data, save_path, fast_io=fast_io)
@@ -0,0 +1,43 @@
+"""Functions to read and write CSV files, optionally using PyArrow for faster parsing."""
+from pathlib import Path
+
+import pandas as pd
+
+
+def read_csv(data_path: Path, fast_io: bool = False) -> pd.DataFrame:
+    """Reads a CSV file into a Pandas DataFrame.
+
+    :param data_path: Path to a CSV file.
+    :param fast_io: Whether to parse the CSV with PyArrow, which is multithreaded and skips
+                    Pandas dtype inference, backing string columns with zero-copy Arrow arrays
+                    (requires the pyarrow package).
+    :return: A Pandas DataFrame containing the CSV data.
+    """
+    if fast_io:
+        try:
+            import pyarrow.csv as pacsv
+        except ImportError:
+            raise ImportError('pyarrow is required when fast_io is True. Install it via "pip install pyarrow".')
+
+        return pacsv.read_csv(data_path).to_pandas(types_mapper=pd.ArrowDtype)
+
+    return pd.read_csv(data_path)
+
+
+def write_csv(data: pd.DataFrame, save_path: Path, fast_io: bool = False) -> None:
+    """Writes a Pandas DataFrame to a CSV file.
+
+    :param data: A Pandas DataFrame.
+    :param save_path: Path to a CSV file where the data will be saved.
+    :param fast_io: Whether to write the CSV with PyArrow (requires the pyarrow package).
+    """
+    if fast_io:
+        try:
+            import pyarrow as pa
+            import pyarrow.csv as pacsv
+        except ImportError:
+            raise ImportError('pyarrow is required when fast_io is True. Install it via "pip install pyarrow".')
+
+        pacsv.write_csv(pa.Table.from_pandas(data, preserve_index=False), save_path)
+    else:
+        data.to_csv(save_path, index=False)
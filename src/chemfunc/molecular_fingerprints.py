@@ -1,4 +1,5 @@
 """Functions to compute fingerprints for molecules."""
+from functools import partial
 from multiprocessing import Pool
 from pathlib import Path
 from typing import Callable, Literal
@@ -6,7 +7,7 @@ from typing import Callable, Literal
 import numpy as np
 import pandas as pd
 from descriptastorus.descriptors import rdNormalizedDescriptors
-from rdkit import Chem
+from rdkit import Chem, DataStructs
 from rdkit.Chem import rdFingerprintGenerator
 from tqdm import tqdm
 
@@ -16,12 +17,9 @@ FingerprintGenerator = Callable[[Molecule], np.ndarray]
 FINGERPRINT_GENERATOR_REGISTRY = {}
 MORGAN_RADIUS = 2
 MORGAN_NUM_BITS = 2048
-MORGAN_PARAMS_TO_GENERATOR = {
-    (MORGAN_RADIUS, MORGAN_NUM_BITS): rdFingerprintGenerator.GetMorganGenerator(
-        radius=MORGAN_RADIUS,
-        fpSize=MORGAN_NUM_BITS
-    )
-}
+
+# Morgan fingerprint generators, created lazily on first use to avoid import-time side effects
+MORGAN_PARAMS_TO_GENERATOR = {}
 
 
 def register_fingerprint_generator(fingerprint_type: str) -> Callable[[FingerprintGenerator], FingerprintGenerator]:
@@ -55,6 +53,44 @@ def get_available_fingerprint_generators() -> list[str]:
     return sorted(FINGERPRINT_GENERATOR_REGISTRY)
 
 
+def compute_morgan_fingerprint_bitvect(
+        mol: Molecule,
+        radius: int = MORGAN_RADIUS,
+        num_bits: int = MORGAN_NUM_BITS
+) -> DataStructs.ExplicitBitVect:
+    """Generates a binary Morgan fingerprint for a molecule as an RDKit ExplicitBitVect.
+
+    Keeping the fingerprint in RDKit's native bitvector representation allows the use of
+    RDKit's C++ bulk similarity routines (e.g., DataStructs.BulkTanimotoSimilarity)
+    without converting to numpy.
+
+    :param mol: A molecule (i.e., either a SMILES string or an RDKit molecule).
+    :param radius: Morgan fingerprint radius.
+    :param num_bits: Number of bits in Morgan fingerprint.
+    :return: An ExplicitBitVect containing the Morgan fingerprint.
+    """
+    # Set up Morgan parameters
+    morgan_params = (radius, num_bits)
+
+    # Convert SMILES to RDKit molecule if necessary
+    mol = Chem.MolFromSmiles(mol) if type(mol) == str else mol
+
+    # Create Morgan fingerprint generator if necessary
+    if morgan_params not in MORGAN_PARAMS_TO_GENERATOR:
+        MORGAN_PARAMS_TO_GENERATOR[morgan_params] = rdFingerprintGenerator.GetMorganGenerator(
+            radius=radius,
+            fpSize=num_bits
+        )
+
+    # Get Morgan fingerprint generator
+    morgan_generator = MORGAN_PARAMS_TO_GENERATOR[morgan_params]
+
+    # Generate fingerprint
+    morgan_fp = morgan_generator.GetFingerprint(mol)
+
+    return morgan_fp
+
+
 @register_fingerprint_generator('morgan')
 def compute_morgan_fingerprint(
         mol: Molecule,
@@ -66,7 +102,7 @@ def compute_morgan_fingerprint(
     :param mol: A molecule (i.e., either a SMILES string or an RDKit molecule).
     :param radius: Morgan fingerprint radius.
     :param num_bits: Number of bits in Morgan fingerprint.
-    :return: A 1D numpy array (num_bits,) containing the Morgan fingerprint.
+    :return: A 1D numpy array (num_bits,) of uint8 containing the binary Morgan fingerprint.
     """
     # Set up Morgan parameters
     morgan_params = (radius, num_bits)
@@ -84,8 +120,8 @@ def compute_morgan_fingerprint(
     # Get Morgan fingerprint generator
     morgan_generator = MORGAN_PARAMS_TO_GENERATOR[morgan_params]
 
-    # Generate fingerprint
-    morgan_fp = morgan_generator.GetFingerprintAsNumPy(mol).astype(np.float32)
+    # Generate fingerprint (already a uint8 numpy array filled on the C++ side)
+    morgan_fp = morgan_generator.GetFingerprintAsNumPy(mol)
 
     return morgan_fp
 
@@ -119,18 +155,60 @@ def compute_fingerprint(mol: Molecule, fingerprint_type: str) -> np.ndarray:
     return fingerprint
 
 
-def compute_fingerprints(mols: list[Molecule], fingerprint_type: str) -> np.ndarray:
+def compute_fingerprints(
+        mols: list[Molecule],
+        fingerprint_type: str,
+        fp_size: int | None = None,
+        as_bitvect: bool = False
+) -> np.ndarray | list[DataStructs.ExplicitBitVect]:
     """Generates molecular fingerprints for each molecule in a list of molecules (in parallel).
 
     :param mols: A list of molecules (i.e., either a SMILES string or an RDKit molecule).
     :param fingerprint_type: The type of fingerprint to compute.
-    :return: A 2D numpy array (num_molecules, num_features) containing the fingerprints for each molecule.
+    :param fp_size: Number of bits in the fingerprint (only supported for 'morgan' fingerprints).
+                    If None, defaults to MORGAN_NUM_BITS.
+    :param as_bitvect: Whether to return the fingerprints as RDKit ExplicitBitVect objects
+                       instead of a numpy array (only supported for 'morgan' fingerprints).
+    :return: A 2D numpy array (num_molecules, num_features) containing the fingerprints for each molecule,
+             or a list of ExplicitBitVect objects if as_bitvect is True.
     """
+    if fp_size is not None and fingerprint_type != 'morgan':
+        raise ValueError(f'fp_size is only supported for "morgan" fingerprints, not "{fingerprint_type}".')
+
+    if as_bitvect:
+        if fingerprint_type != 'morgan':
+            raise ValueError(f'as_bitvect is only supported for "morgan" fingerprints, not "{fingerprint_type}".')
+
+        fingerprint_generator = partial(
+            compute_morgan_fingerprint_bitvect,
+            num_bits=fp_size if fp_size is not None else MORGAN_NUM_BITS
+        )
+
+        with Pool() as pool:
+            fingerprints = list(tqdm(pool.imap(fingerprint_generator, mols),
+                                     total=len(mols), desc=f'{fingerprint_type} fingerprints'))
+
+        return fingerprints
+
     fingerprint_generator = get_fingerprint_generator(fingerprint_type)
 
+    if fp_size is not None:
+        fingerprint_generator = partial(fingerprint_generator, num_bits=fp_size)
+
+    # Fill a preallocated contiguous array row by row rather than boxing a list of arrays via np.array
     with Pool() as pool:
-        fingerprints = np.array(list(tqdm(pool.imap(fingerprint_generator, mols),
-                                          total=len(mols), desc=f'{fingerprint_type} fingerprints')))
+        fingerprints_iterator = tqdm(pool.imap(fingerprint_generator, mols),
+                                     total=len(mols), desc=f'{fingerprint_type} fingerprints')
+
+        fingerprints = None
+        for index, fingerprint in enumerate(fingerprints_iterator):
+            if fingerprints is None:
+                fingerprints = np.empty((len(mols), len(fingerprint)), dtype=fingerprint.dtype)
+
+            fingerprints[index] = fingerprint
+
+    if fingerprints is None:
+        fingerprints = np.empty((0, 0))
 
     return fingerprints
 
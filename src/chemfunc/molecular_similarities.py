@@ -1,18 +1,35 @@
 """Functions to compute the similarities between molecules."""
-from functools import partial
+import os
 from itertools import product
-from multiprocessing import Pool
+from multiprocessing import Pool, cpu_count
 from typing import Callable, Iterable, Literal
 
 import numpy as np
+from numba import config as numba_config, njit, prange, types
+from numba.extending import intrinsic
 from rdkit import Chem
 from rdkit.Chem.rdFMCS import FindMCS
-from sklearn.metrics import pairwise_distances
-from tqdm import tqdm
+from tqdm import tqdm, trange
+
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
 
 from chemfunc.constants import Molecule
 from chemfunc.molecular_fingerprints import compute_fingerprints
 
+# Numba's default threading layer (TBB or OpenMP) deadlocks at interpreter exit when the parallel
+# kernels below run in a process that also forks multiprocessing Pools, as this package does.
+# The workqueue layer is fork-safe; only pin it if the user has not chosen a layer explicitly.
+if 'NUMBA_THREADING_LAYER' not in os.environ:
+    numba_config.THREADING_LAYER = 'workqueue'
+
 SimilarityFunction = Callable[[Iterable[Molecule], Iterable[Molecule] | None], np.ndarray]
 SIMILARITY_FUNCTION_REGISTRY = {}
 
@@ -48,10 +65,131 @@ def get_available_similarity_functions() -> list[str]:
     return sorted(SIMILARITY_FUNCTION_REGISTRY)
 
 
+@intrinsic
+def _popcount64(typingctx, src: types.Type) -> tuple:
+    """Numba intrinsic which counts the number of set bits in a 64-bit integer (llvm.ctpop.i64).
+
+    :param typingctx: The Numba typing context.
+    :param src: The Numba type of the argument (must be uint64).
+    :return: A (signature, code generation function) tuple for the intrinsic.
+    """
+    if src != types.uint64:
+        return None
+
+    sig = types.uint64(types.uint64)
+
+    def codegen(context, builder, signature, args):
+        return builder.ctpop(args[0])
+
+    return sig, codegen
+
+
+# Templates for popcount kernels specialized (and unrolled) per fingerprint word count at runtime.
+# Unrolling the fixed-size word loop gives the compiler a straight-line popcount chain with full
+# instruction-level parallelism and no loop overhead.
+_TANIMOTO_SIMILARITY_KERNEL_TEMPLATE = """
+def _kernel(packed_fps_1, packed_fps_2, out):
+    num_fps_1 = packed_fps_1.shape[0]
+    num_fps_2 = packed_fps_2.shape[0]
+
+    for i in prange(num_fps_1):
+        fp_1 = packed_fps_1[i]
+        size_1 = {size_1}
+
+        for j in range(num_fps_2):
+            fp_2 = packed_fps_2[j]
+            intersection = {intersection}
+            size_2 = {size_2}
+            union = size_1 + size_2 - intersection
+            out[i, j] = intersection / union if union > 0 else 1.0
+"""
+
+_INTERSECTION_SIZE_KERNEL_TEMPLATE = """
+def _kernel(packed_fps_1, packed_fps_2, out):
+    num_fps_1 = packed_fps_1.shape[0]
+    num_fps_2 = packed_fps_2.shape[0]
+
+    for i in prange(num_fps_1):
+        fp_1 = packed_fps_1[i]
+
+        for j in range(num_fps_2):
+            fp_2 = packed_fps_2[j]
+            out[i, j] = {intersection}
+"""
+
+_KERNEL_CACHE = {}
+
+
+def _compile_popcount_kernel(template: str, num_words: int) -> Callable[[np.ndarray, np.ndarray, np.ndarray], None]:
+    """Compiles a parallel popcount kernel specialized for a fixed number of uint64 words per fingerprint.
+
+    The word loop is unrolled into straight-line popcount expressions for the given width
+    and the result is cached, so each fingerprint length is compiled once per process.
+
+    :param template: The kernel source template to specialize.
+    :param num_words: The number of uint64 words per packed fingerprint.
+    :return: A Numba-compiled kernel taking (packed_fps_1, packed_fps_2, out).
+    """
+    cache_key = (template, num_words)
+
+    if cache_key not in _KERNEL_CACHE:
+        source = template.format(
+            size_1=' + '.join(f'_popcount64(fp_1[{k}])' for k in range(num_words)),
+            size_2=' + '.join(f'_popcount64(fp_2[{k}])' for k in range(num_words)),
+            intersection=' + '.join(f'_popcount64(fp_1[{k}] & fp_2[{k}])' for k in range(num_words))
+        )
+        namespace = {'prange': prange, '_popcount64': _popcount64}
+        exec(source, namespace)
+        _KERNEL_CACHE[cache_key] = njit(parallel=True, fastmath=True)(namespace['_kernel'])
+
+    return _KERNEL_CACHE[cache_key]
+
+
+def _pack_fingerprints(fps: np.ndarray) -> np.ndarray:
+    """Packs a 2D binary fingerprint array into 64-bit words.
+
+    :param fps: A 2D numpy array (num_molecules, num_bits) of binary fingerprints.
+    :return: A 2D numpy array (num_molecules, num_bits // 64) of uint64-packed fingerprints.
+    """
+    packed_fps = np.packbits(fps, axis=1)
+
+    # Pad to a multiple of eight bytes so the array can be viewed as uint64 words
+    if packed_fps.shape[1] % 8 != 0:
+        packed_fps = np.pad(packed_fps, ((0, 0), (0, 8 - packed_fps.shape[1] % 8)))
+
+    return np.ascontiguousarray(packed_fps).view(np.uint64)
+
+
+def _packed_tanimoto_similarities(packed_fps_1: np.ndarray, packed_fps_2: np.ndarray) -> np.ndarray:
+    """Computes pairwise Tanimoto similarities between uint64-packed fingerprints.
+
+    Uses SimSIMD's packed-bit Jaccard kernel if available and otherwise the Numba popcount kernel.
+    Similarities are float32, which is plenty of precision for ranking and display and halves the
+    memory of the similarity matrix.
+
+    :param packed_fps_1: A 2D numpy array (num_molecules_1, num_words) of uint64-packed fingerprints.
+    :param packed_fps_2: A 2D numpy array (num_molecules_2, num_words) of uint64-packed fingerprints.
+    :return: A 2D numpy array (num_molecules_1, num_molecules_2) of pairwise similarities (float32).
+    """
+    if simsimd is not None:
+        return 1 - np.array(simsimd.cdist(packed_fps_1.view(np.uint8), packed_fps_2.view(np.uint8),
+                                          metric='jaccard', dtype='bin8', out_dtype='float32',
+                                          threads=cpu_count()))
+
+    kernel = _compile_popcount_kernel(_TANIMOTO_SIMILARITY_KERNEL_TEMPLATE, packed_fps_1.shape[1])
+    tanimoto_similarities = np.empty((len(packed_fps_1), len(packed_fps_2)), dtype=np.float32)
+    kernel(packed_fps_1, packed_fps_2, tanimoto_similarities)
+
+    return tanimoto_similarities
+
+
 @register_similarity_function('tanimoto')
 def compute_pairwise_tanimoto_similarities(
-        mols_1: list[Molecule],
-        mols_2: list[Molecule] | None = None
+        mols_1: list[Molecule] | None = None,
+        mols_2: list[Molecule] | None = None,
+        fp_size: int | None = None,
+        fps_1: np.ndarray | None = None,
+        fps_2: np.ndarray | None = None
 ) -> np.ndarray:
     """
     Computes pairwise Tanimoto similarities between the molecules in mols_1 and mols_2.
@@ -59,25 +197,139 @@ def compute_pairwise_tanimoto_similarities(
     :param mols_1: A list of molecules, either SMILES strings or RDKit molecules.
     :param mols_2: A list of molecules, either SMILES strings or RDKit molecules.
                    If None, copies mols_1 list.
+    :param fp_size: Number of bits in the Morgan fingerprints. If None, defaults to MORGAN_NUM_BITS.
+                    Smaller fingerprints (e.g., 1024 bits) halve the memory traffic of the pairwise
+                    step with negligible accuracy loss for nearest neighbor ranking.
+    :param fps_1: Precomputed binary Morgan fingerprints for mols_1 (from compute_fingerprints).
+                  If provided, fingerprints are not recomputed, which is useful when computing
+                  multiple similarity matrices over the same molecule set.
+    :param fps_2: Precomputed binary Morgan fingerprints for mols_2 (from compute_fingerprints).
     :return: A 2D numpy array of pairwise similarities.
     """
-    # Compute Morgan fingerprints
-    fps_1 = np.array(compute_fingerprints(
-        mols=mols_1,
-        fingerprint_type='morgan'
-    ), dtype=bool)
-    fps_2 = np.array(compute_fingerprints(
-        mols=mols_2,
-        fingerprint_type='morgan'
-    ), dtype=bool) if mols_2 is not None else fps_1
+    if mols_1 is None and fps_1 is None:
+        raise ValueError('Either mols_1 or fps_1 must be provided.')
+
+    # Compute Morgan fingerprints unless precomputed fingerprints were provided
+    if fps_1 is None:
+        fps_1 = compute_fingerprints(
+            mols=mols_1,
+            fingerprint_type='morgan',
+            fp_size=fp_size
+        )
+
+    if fps_2 is None:
+        fps_2 = compute_fingerprints(
+            mols=mols_2,
+            fingerprint_type='morgan',
+            fp_size=fp_size
+        ) if mols_2 is not None else fps_1
+
+    # Pack fingerprints into uint64 words
+    packed_fps_1 = _pack_fingerprints(fps_1)
+    packed_fps_2 = _pack_fingerprints(fps_2) if fps_2 is not fps_1 else packed_fps_1
 
     # Compute pairwise Tanimoto similarities
-    tanimoto_distances = pairwise_distances(fps_1, fps_2, metric='jaccard', n_jobs=-1)
-    tanimoto_similarities = 1 - tanimoto_distances
+    tanimoto_similarities = _packed_tanimoto_similarities(packed_fps_1, packed_fps_2)
 
     return tanimoto_similarities
 
 
+def compute_tanimoto_nearest_neighbors(
+        mols_1: list[Molecule] | None = None,
+        mols_2: list[Molecule] | None = None,
+        block_size: int = 4096,
+        use_faiss: bool = False,
+        num_candidates: int = 16,
+        fp_size: int | None = None,
+        fps_1: np.ndarray | None = None,
+        fps_2: np.ndarray | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """For each molecule in mols_1, finds the most similar molecule in mols_2 by Tanimoto similarity.
+
+    Processes mols_1 in row blocks and takes the argmax within each block, so only a
+    (block_size, num_molecules_2) similarity block is ever materialized rather than the full
+    pairwise matrix. This makes nearest neighbor search feasible for arbitrarily large mols_1.
+
+    If use_faiss is True, a FAISS binary index retrieves the num_candidates nearest molecules
+    by Hamming distance per query and only those candidates are reranked by exact Tanimoto,
+    making the search sub-linear in the reference set size. Since Hamming distance is not
+    perfectly monotone in Tanimoto similarity, the result may occasionally miss the true
+    nearest neighbor; increase num_candidates for higher accuracy.
+
+    :param mols_1: A list of molecules, either SMILES strings or RDKit molecules.
+    :param mols_2: A list of molecules, either SMILES strings or RDKit molecules.
+                   If None, copies mols_1 list.
+    :param block_size: The number of rows of the similarity matrix to materialize at a time.
+    :param use_faiss: Whether to use a FAISS binary index to search for nearest neighbor candidates
+                      (requires the faiss-cpu package).
+    :param num_candidates: For FAISS only, the number of Hamming nearest neighbor candidates
+                           to rerank by exact Tanimoto similarity per query molecule.
+    :param fp_size: Number of bits in the Morgan fingerprints. If None, defaults to MORGAN_NUM_BITS.
+    :param fps_1: Precomputed binary Morgan fingerprints for mols_1 (from compute_fingerprints).
+                  If provided, fingerprints are not recomputed.
+    :param fps_2: Precomputed binary Morgan fingerprints for mols_2 (from compute_fingerprints).
+    :return: A tuple of two 1D numpy arrays containing, for each molecule in mols_1,
+             the index of the most similar molecule in mols_2 and the corresponding similarity.
+    """
+    if use_faiss and faiss is None:
+        raise ImportError('faiss is required when use_faiss is True. Install it via "pip install faiss-cpu".')
+
+    if mols_1 is None and fps_1 is None:
+        raise ValueError('Either mols_1 or fps_1 must be provided.')
+
+    # Compute Morgan fingerprints unless precomputed fingerprints were provided
+    if fps_1 is None:
+        fps_1 = compute_fingerprints(
+            mols=mols_1,
+            fingerprint_type='morgan',
+            fp_size=fp_size
+        )
+
+    if fps_2 is None:
+        fps_2 = compute_fingerprints(
+            mols=mols_2,
+            fingerprint_type='morgan',
+            fp_size=fp_size
+        ) if mols_2 is not None else fps_1
+
+    # Pack fingerprints into uint64 words
+    packed_fps_1 = _pack_fingerprints(fps_1)
+    packed_fps_2 = _pack_fingerprints(fps_2) if fps_2 is not fps_1 else packed_fps_1
+
+    # Optionally build a FAISS binary index over the reference fingerprints
+    if use_faiss:
+        index = faiss.IndexBinaryFlat(packed_fps_2.shape[1] * 64)
+        index.add(packed_fps_2.view(np.uint8))
+        num_candidates = min(num_candidates, len(packed_fps_2))
+        sizes_2 = np.bitwise_count(packed_fps_2).sum(axis=1)
+
+    # Compute nearest neighbors block by block
+    max_similarity_indices = np.empty(len(fps_1), dtype=int)
+    max_similarities = np.empty(len(fps_1), dtype=np.float32)
+
+    for start in trange(0, len(fps_1), block_size, desc='nearest neighbors'):
+        block_fps = packed_fps_1[start:start + block_size]
+
+        if use_faiss:
+            # Retrieve Hamming nearest neighbor candidates, then rerank them by exact Tanimoto
+            _, candidate_indices = index.search(block_fps.view(np.uint8), num_candidates)
+            intersections = np.bitwise_count(block_fps[:, np.newaxis] & packed_fps_2[candidate_indices]).sum(axis=2)
+            sizes_1 = np.bitwise_count(block_fps).sum(axis=1)
+            block_similarities = intersections / (sizes_1[:, np.newaxis] + sizes_2[candidate_indices] - intersections)
+            best = np.argmax(block_similarities, axis=1)
+            block_indices = candidate_indices[np.arange(len(best)), best]
+            block_max_similarities = block_similarities[np.arange(len(best)), best]
+        else:
+            block_similarities = _packed_tanimoto_similarities(block_fps, packed_fps_2)
+            block_indices = np.argmax(block_similarities, axis=1)
+            block_max_similarities = block_similarities[np.arange(len(block_indices)), block_indices]
+
+        max_similarity_indices[start:start + block_size] = block_indices
+        max_similarities[start:start + block_size] = block_max_similarities
+
+    return max_similarity_indices, max_similarities
+
+
 def compute_mcs_size(
         mols: Iterable[Chem.Mol],
         match_valences: bool = False,
@@ -97,6 +349,50 @@ def compute_mcs_size(
                    completeRingsOnly=complete_rings_only).numAtoms
 
 
+def _init_mcs_pool(
+        mols_1: list[Chem.Mol],
+        mols_2: list[Chem.Mol],
+        canonical_smiles_1: list[str],
+        canonical_smiles_2: list[str],
+        mcs_kwargs: dict
+) -> None:
+    """Initializes an MCS worker process with the molecules and MCS settings (avoids pickling mols per task).
+
+    :param mols_1: A list of RDKit molecules.
+    :param mols_2: A list of RDKit molecules.
+    :param canonical_smiles_1: The canonical SMILES of the molecules in mols_1.
+    :param canonical_smiles_2: The canonical SMILES of the molecules in mols_2.
+    :param mcs_kwargs: Keyword arguments to pass to compute_mcs_size.
+    """
+    global _MCS_POOL_MOLS_1, _MCS_POOL_MOLS_2, _MCS_POOL_SMILES_1, _MCS_POOL_SMILES_2, \
+        _MCS_POOL_KWARGS, _MCS_POOL_CACHE
+
+    _MCS_POOL_MOLS_1 = mols_1
+    _MCS_POOL_MOLS_2 = mols_2
+    _MCS_POOL_SMILES_1 = canonical_smiles_1
+    _MCS_POOL_SMILES_2 = canonical_smiles_2
+    _MCS_POOL_KWARGS = mcs_kwargs
+    _MCS_POOL_CACHE = {}
+
+
+def _compute_mcs_size_from_indices(indices: tuple[int, int]) -> tuple[int, int, int]:
+    """Computes the MCS size for a pair of molecules looked up by index in the worker's molecule lists.
+
+    MCS sizes are cached per worker by the sorted pair of canonical SMILES, so duplicate molecules
+    (and mirrored pairs) skip the exponential FindMCS call.
+
+    :param indices: A tuple of (index into mols_1, index into mols_2).
+    :return: A tuple of (index into mols_1, index into mols_2, MCS size).
+    """
+    i, j = indices
+    key = tuple(sorted((_MCS_POOL_SMILES_1[i], _MCS_POOL_SMILES_2[j])))
+
+    if key not in _MCS_POOL_CACHE:
+        _MCS_POOL_CACHE[key] = compute_mcs_size((_MCS_POOL_MOLS_1[i], _MCS_POOL_MOLS_2[j]), **_MCS_POOL_KWARGS)
+
+    return i, j, _MCS_POOL_CACHE[key]
+
+
 @register_similarity_function('mcs')
 def compute_pairwise_mcs_similarities(
         mols_1: list[Molecule],
@@ -121,6 +417,9 @@ def compute_pairwise_mcs_similarities(
                         avg: similarity = 0.5 * (MCS_size / num_atoms_mol_1 + MCS_size / num_atoms_mol_2)
     :return: A 2D numpy array of pairwise similarities.
     """
+    # Whether mols_1 and mols_2 are the same set, in which case MCS sizes are symmetric
+    symmetric = mols_2 is None
+
     # Convert SMILES to RDKit molecules if needed
     mols_1 = [
         Chem.MolFromSmiles(mol) if isinstance(mol, str) else mol
@@ -135,22 +434,39 @@ def compute_pairwise_mcs_similarities(
     else:
         mols_2 = mols_1
 
-    # Set up MCS function
-    compute_mcs_size_fn = partial(
-        compute_mcs_size,
-        match_valences=match_valences,
-        ring_matches_ring_only=ring_matches_ring_only,
-        complete_rings_only=complete_rings_only
-    )
-
-    # Compute pairwise MCS sizes
-    with Pool() as pool:
-        pairwise_mcs = np.array(
-            list(tqdm(pool.imap(compute_mcs_size_fn, product(mols_1, mols_2)),
-                      total=len(mols_1) * len(mols_2)))
-        )
+    # Set up MCS keyword arguments
+    mcs_kwargs = {
+        'match_valences': match_valences,
+        'ring_matches_ring_only': ring_matches_ring_only,
+        'complete_rings_only': complete_rings_only
+    }
+
+    # Compute canonical SMILES, which serve as cache keys so duplicate molecules share MCS results
+    canonical_smiles_1 = [Chem.MolToSmiles(mol) for mol in mols_1]
+    canonical_smiles_2 = canonical_smiles_1 if mols_2 is mols_1 else [Chem.MolToSmiles(mol) for mol in mols_2]
+
+    # Set up index pairs, only computing the upper triangle when the MCS sizes are symmetric
+    if symmetric:
+        pairs = [(i, j) for i in range(len(mols_1)) for j in range(i + 1, len(mols_1))]
+    else:
+        pairs = list(product(range(len(mols_1)), range(len(mols_2))))
 
-    pairwise_mcs = pairwise_mcs.reshape(len(mols_1), len(mols_2))
+    # Compute pairwise MCS sizes, with large chunks to limit inter-process communication overhead
+    pairwise_mcs = np.zeros((len(mols_1), len(mols_2)))
+    chunksize = max(1, len(pairs) // (cpu_count() * 16))
+
+    with Pool(initializer=_init_mcs_pool,
+              initargs=(mols_1, mols_2, canonical_smiles_1, canonical_smiles_2, mcs_kwargs)) as pool:
+        for i, j, mcs_size in tqdm(pool.imap_unordered(_compute_mcs_size_from_indices, pairs, chunksize=chunksize),
+                                   total=len(pairs)):
+            pairwise_mcs[i, j] = mcs_size
+
+    # Mirror the upper triangle and fill in the diagonal. The MCS of a molecule with itself is its
+    # largest fragment (not the whole molecule) since FindMCS cannot span disconnected fragments,
+    # which matters for salt-form SMILES.
+    if symmetric:
+        pairwise_mcs += pairwise_mcs.transpose()
+        np.fill_diagonal(pairwise_mcs, [max(map(len, Chem.GetMolFrags(mol))) for mol in mols_1])
 
     # Compute MCS similarities
     if denominator == 'mol_1':
@@ -171,8 +487,11 @@ def compute_pairwise_mcs_similarities(
 
 @register_similarity_function('tversky')
 def compute_pairwise_tversky_similarities(
-        mols_1: list[Molecule],
-        mols_2: list[Molecule] | None = None
+        mols_1: list[Molecule] | None = None,
+        mols_2: list[Molecule] | None = None,
+        fp_size: int | None = None,
+        fps_1: np.ndarray | None = None,
+        fps_2: np.ndarray | None = None
 ) -> np.ndarray:
     """
     Computes pairwise Tversky similarities between the molecules in mols_1 and mols_2.
@@ -183,16 +502,34 @@ def compute_pairwise_tversky_similarities(
     :param mols_1: A list of molecules, either SMILES strings or RDKit molecules.
     :param mols_2: A list of molecules, either SMILES strings or RDKit molecules.
                    If None, copies mols_1 list.
+    :param fp_size: Number of bits in the Morgan fingerprints. If None, defaults to MORGAN_NUM_BITS.
+    :param fps_1: Precomputed binary Morgan fingerprints for mols_1 (from compute_fingerprints).
+                  If provided, fingerprints are not recomputed.
+    :param fps_2: Precomputed binary Morgan fingerprints for mols_2 (from compute_fingerprints).
     :return: A 2D numpy array of pairwise similarities.
     """
-    # Compute Morgan fingerprints
-    fps_1 = np.array(compute_fingerprints(mols_1, fingerprint_type='morgan'), dtype=int)
-    fps_2 = np.array(compute_fingerprints(mols_2, fingerprint_type='morgan'),
-                     dtype=int) if mols_2 is not None else fps_1
+    if mols_1 is None and fps_1 is None:
+        raise ValueError('Either mols_1 or fps_1 must be provided.')
+
+    # Compute Morgan fingerprints unless precomputed fingerprints were provided
+    if fps_1 is None:
+        fps_1 = compute_fingerprints(mols_1, fingerprint_type='morgan', fp_size=fp_size)
+
+    if fps_2 is None:
+        fps_2 = compute_fingerprints(mols_2, fingerprint_type='morgan', fp_size=fp_size) \
+            if mols_2 is not None else fps_1
+
+    # Pack fingerprints into uint64 words
+    packed_fps_1 = _pack_fingerprints(fps_1)
+    packed_fps_2 = _pack_fingerprints(fps_2) if fps_2 is not fps_1 else packed_fps_1
+
+    # Compute pairwise intersection sizes via popcount (equivalent to the integer matmul on unpacked bits)
+    kernel = _compile_popcount_kernel(_INTERSECTION_SIZE_KERNEL_TEMPLATE, packed_fps_1.shape[1])
+    intersection = np.empty((len(fps_1), len(fps_2)), dtype=np.float32)
+    kernel(packed_fps_1, packed_fps_2, intersection)
 
     # Compute pairwise Tversky similarities
-    intersection = fps_1 @ fps_2.transpose()
-    size_2 = fps_2.sum(axis=1)
+    size_2 = np.bitwise_count(packed_fps_2).sum(axis=1, dtype=np.float32)
     tversky_similarities = intersection / size_2
 
     return tversky_similarities
@@ -227,6 +564,15 @@ def compute_top_similarities(
     # Compute pairwise similarities
     pairwise_similarities = get_similarity_function(similarity_type)(mols, reference_mols)
 
+    # For the nearest neighbor case within a single set, exclude the self similarity via a per-row
+    # top-2 partition: if the row maximum equals the diagonal entry, dropping one occurrence of it
+    # leaves the second largest value. This avoids the full-matrix fill_diagonal write and then max.
+    if isinstance(top_k, int) and top_k == 1 and reference_mols is None and pairwise_similarities.shape[1] >= 2:
+        diagonal = np.diagonal(pairwise_similarities).copy()
+        top_2 = np.partition(pairwise_similarities, -2, axis=1)[:, -2:]
+
+        return np.where(top_2[:, 1] == diagonal, top_2[:, 0], top_2[:, 1])
+
     # Prevent comparison to self molecule
     if reference_mols is None:
         np.fill_diagonal(pairwise_similarities, -np.inf)
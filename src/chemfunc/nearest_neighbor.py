@@ -3,10 +3,10 @@ from pathlib import Path
 from typing import Literal
 
 import numpy as np
-import pandas as pd
 
 from chemfunc.constants import SMILES_COLUMN
-from chemfunc.molecular_similarities import get_similarity_function
+from chemfunc.csv_io import read_csv, write_csv
+from chemfunc.molecular_similarities import compute_tanimoto_nearest_neighbors, get_similarity_function
 
 
 def nearest_neighbor(
@@ -21,6 +21,9 @@ def nearest_neighbor(
         ring_matches_ring_only: bool = False,
         complete_rings_only: bool = False,
         denominator: Literal['mol_1', 'mol_2', 'avg'] = 'mol_2',
+        use_faiss: bool = False,
+        fp_size: int | None = None,
+        fast_io: bool = False,
 ) -> None:
     """Given a dataset, computes the nearest neighbor molecule by Tanimoto similarity in a second dataset.
 
@@ -43,6 +46,13 @@ def nearest_neighbor(
                     mol_1: similarity = MCS_size / num_atoms_mol_1
                     mol_2: similarity = MCS_size / num_atoms_mol_2
                     avg: similarity = 0.5 * (MCS_size / num_atoms_mol_1 + MCS_size / num_atoms_mol_2)
+    :param use_faiss: For Tanimoto only, whether to use a FAISS binary index to search for nearest neighbor
+                      candidates (approximate; requires the faiss-cpu package).
+    :param fp_size: For Tanimoto and Tversky only, the number of bits in the Morgan fingerprints
+                    (defaults to 2048). Smaller fingerprints (e.g., 1024 bits) halve the memory
+                    traffic of the pairwise step with negligible accuracy loss.
+    :param fast_io: Whether to read and write CSV files with PyArrow, which parses multithreaded
+                    and skips Pandas dtype inference (requires the pyarrow package).
     """
     # Set save path
     if save_path is None:
@@ -53,8 +63,8 @@ def nearest_neighbor(
         reference_smiles_column = smiles_column
 
     print('Loading data')
-    data = pd.read_csv(data_path)
-    reference_data = pd.read_csv(reference_data_path)
+    data = read_csv(data_path, fast_io=fast_io)
+    reference_data = read_csv(reference_data_path, fast_io=fast_io)
 
     # Sort reference data and drop duplicates
     reference_data.drop_duplicates(subset=reference_smiles_column, inplace=True)
@@ -69,29 +79,38 @@ def nearest_neighbor(
             'denominator': denominator,
         }
     else:
-        kwargs = {}
+        kwargs = {'fp_size': fp_size}
 
     print(f'Computing similarities using {metric} metric')
-    similarities = get_similarity_function(metric)(
-        data[smiles_column],
-        reference_data[reference_smiles_column],
-        **kwargs
-    )
+
+    # For Tanimoto, fuse the pairwise similarities and argmax in row blocks
+    # to avoid materializing the full N x M similarity matrix
+    if metric == 'tanimoto':
+        max_similarity_indices, max_similarities = compute_tanimoto_nearest_neighbors(
+            data[smiles_column],
+            reference_data[reference_smiles_column],
+            use_faiss=use_faiss,
+            fp_size=fp_size
+        )
+    else:
+        similarities = get_similarity_function(metric)(
+            data[smiles_column],
+            reference_data[reference_smiles_column],
+            **kwargs
+        )
+        max_similarity_indices = np.argmax(similarities, axis=1)
+        max_similarities = similarities[np.arange(len(max_similarity_indices)), max_similarity_indices]
 
     print('Finding minimum distance SMILES')
     prefix = f'{f"{reference_name}_" if reference_name is not None else ""}{metric}_'
 
-    max_similarity_indices = np.argmax(similarities, axis=1)
-
-    data[f'{prefix}nearest_neighbor'] = [
-        reference_data[reference_smiles_column][max_similarity_index]
-        for max_similarity_index in max_similarity_indices
-    ]
-    data[f'{prefix}nearest_neighbor_similarity'] = [
-        similarities[i, max_similarity_index]
-        for i, max_similarity_index in enumerate(max_similarity_indices)
-    ]
+    # Assign contiguous numpy arrays so pandas takes them without re-boxing (and without SettingWithCopyWarning)
+    reference_smiles = np.asarray(reference_data[reference_smiles_column], dtype=object)
+    data = data.assign(**{
+        f'{prefix}nearest_neighbor': reference_smiles[max_similarity_indices],
+        f'{prefix}nearest_neighbor_similarity': max_similarities
+    })
 
     print('Saving')
     save_path.parent.mkdir(parents=True, exist_ok=True)
-    data.to_csv(save_path, index=False)
+    write_csv(data, save_path, fast_io=fast_io)